@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Adaptive Detection Scheduler
+Adjusts detection resolution and frame skip to stay within a latency budget
+"""
+
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Operating points from best quality to cheapest: (downscale factor, analyse every Nth frame)
+OPERATING_POINTS = [
+    (1, 1),
+    (2, 1),
+    (2, 2),
+    (3, 2),
+    (4, 2),
+    (4, 3),
+    (4, 4),
+]
+
+class AdaptiveDetectionScheduler:
+    def __init__(self, detector, latency_budget=0.066, headroom=0.6, smoothing=0.2, settle_frames=5):
+        self.detector = detector
+        self.latency_budget = latency_budget  # seconds of detection time per frame
+        self.headroom = headroom  # scale back up when cost < budget * headroom
+        self.smoothing = smoothing  # EWMA weight of the newest sample
+        self.settle_frames = settle_frames  # detections to measure before changing again
+
+        self.level = 0
+        self.avg_processing_time = None
+        self.samples_at_level = 0
+        self.frame_index = 0
+        self.last_objects = []
+        self.fresh = False  # whether the last result came from a new detection
+
+        # Metrics
+        self.detections = 0
+        self.skipped_frames = 0
+        self.level_changes = 0
+
+    @property
+    def scale(self):
+        return OPERATING_POINTS[self.level][0]
+
+    @property
+    def skip(self):
+        return OPERATING_POINTS[self.level][1]
+
+    def find_red_objects(self, frame):
+        """Detect red objects, reusing the last result on skipped frames"""
+        self.frame_index += 1
+        if (self.frame_index - 1) % self.skip:
+            self.skipped_frames += 1
+            self.fresh = False
+            return self.last_objects
+
+        start = time.perf_counter()
+        self.last_objects = self.detector.find_red_objects(frame, scale=self.scale)
+        self.record(time.perf_counter() - start)
+        self.fresh = True
+
+        return self.last_objects
+
+    def record(self, processing_time):
+        """Fold a detection time into the average and adapt the operating point"""
+        self.detections += 1
+        if self.avg_processing_time is None:
+            self.avg_processing_time = processing_time
+        else:
+            self.avg_processing_time += self.smoothing * (processing_time - self.avg_processing_time)
+
+        self.samples_at_level += 1
+        if self.samples_at_level < self.settle_frames:
+            return
+
+        if self.frame_cost(self.level) > self.latency_budget and self.level < len(OPERATING_POINTS) - 1:
+            self.set_level(self.level + 1)
+        elif self.level > 0 and self.frame_cost(self.level - 1) < self.latency_budget * self.headroom:
+            # Only scale back up when the better point is predicted to fit with headroom
+            self.set_level(self.level - 1)
+
+    def frame_cost(self, level):
+        """Estimated detection cost per frame at an operating point, from the current average"""
+        scale, skip = OPERATING_POINTS[level]
+        return self.avg_processing_time * (self.scale / scale) ** 2 / skip
+
+    def set_level(self, level):
+        old_scale, old_skip = self.scale, self.skip
+        self.level = level
+        self.samples_at_level = 0
+        self.level_changes += 1
+
+        # Estimate the cost at the new resolution so the next decision doesn't start from stale data
+        self.avg_processing_time *= (old_scale / self.scale) ** 2
+        self.frame_index = 0
+
+        logger.info(f"⚙️ Detection operating point: scale 1/{self.scale}, every {self.skip} frame(s) "
+                    f"(was 1/{old_scale}, every {old_skip})")
+
+    def metrics(self):
+        return {
+            'scale': self.scale,
+            'skip': self.skip,
+            'level': self.level,
+            'avg_processing_ms': 1000 * (self.avg_processing_time or 0.0),
+            'latency_budget_ms': 1000 * self.latency_budget,
+            'detections': self.detections,
+            'skipped_frames': self.skipped_frames,
+            'level_changes': self.level_changes
+        }
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Binary Command Protocol for the WebSocket bridge
+Fixed-size struct-packed frames, negotiated as the WebSocket subprotocol
+'mizo.bin.v1'. Clients that don't ask for it keep using JSON text frames.
+
+Frame layout (little-endian, 20 bytes):
+    type (u8) | command (u8) | flags (u8) | pad | seq (u32) |
+    left_speed (i16) | right_speed (i16) | timestamp_us (i64)
+
+Run this file to benchmark it against the JSON protocol.
+"""
+
+import json
+import struct
+import time
+
+SUBPROTOCOL = 'mizo.bin.v1'
+
+FRAME = struct.Struct('<BBBxIhhq')
+
+# Message types
+MSG_SETPOINT = 1  # client -> bridge: drive the wheels at left/right speed
+MSG_COMMAND = 2  # client -> bridge: named movement command
+MSG_ACK = 3  # bridge -> client: result for the frame with the same seq
+MSG_STATUS = 4  # bridge -> all clients: broadcast of an executed command
+
+# Command codes (MSG_SETPOINT frames use COMMAND_NONE)
+COMMAND_NONE = 0
+COMMAND_CODES = {
+    'forward': 1,
+    'backward': 2,
+    'left': 3,
+    'right': 4,
+    'stop': 5
+}
+COMMAND_NAMES = {code: name for name, code in COMMAND_CODES.items()}
+
+# Flags
+FLAG_SUCCESS = 0x01
+FLAG_SUPERSEDED = 0x02  # ack for a setpoint replaced by a newer one before it reached the wheels
+
+def now_us():
+    return int(time.time() * 1_000_000)
+
+def encode(msg_type, seq=0, command=None, left_speed=0, right_speed=0, success=False, superseded=False,
+           timestamp_us=None):
+    """Pack one frame"""
+    return FRAME.pack(
+        msg_type,
+        COMMAND_CODES.get(command, COMMAND_NONE),
+        (FLAG_SUCCESS if success else 0) | (FLAG_SUPERSEDED if superseded else 0),
+        seq & 0xFFFFFFFF,
+        max(-32768, min(32767, int(left_speed))),
+        max(-32768, min(32767, int(right_speed))),
+        now_us() if timestamp_us is None else timestamp_us
+    )
+
+def decode(frame):
+    """Unpack one frame into a dict, raises ValueError on a malformed frame"""
+    if len(frame) != FRAME.size:
+        raise ValueError(f"Expected a {FRAME.size}-byte frame, got {len(frame)} bytes")
+
+    msg_type, command, flags, seq, left_speed, right_speed, timestamp_us = FRAME.unpack(frame)
+    return {
+        'type': msg_type,
+        'command': COMMAND_NAMES.get(command),
+        'success': bool(flags & FLAG_SUCCESS),
+        'superseded': bool(flags & FLAG_SUPERSEDED),
+        'seq': seq,
+        'left_speed': left_speed,
+        'right_speed': right_speed,
+        'timestamp_us': timestamp_us
+    }
+
+def benchmark(iterations=200000):
+    """Compare encode/decode cost and size of a status message in both protocols"""
+    json_message = {
+        'type': 'status',
+        'command': 'forward',
+        'success': True,
+        'timestamp': time.time()
+    }
+    binary_message = encode(MSG_STATUS, seq=12345, command='forward', success=True)
+    json_text = json.dumps(json_message)
+
+    cases = [
+        ('JSON encode', lambda: json.dumps(json_message)),
+        ('JSON decode', lambda: json.loads(json_text)),
+        ('binary encode', lambda: encode(MSG_STATUS, seq=12345, command='forward', success=True)),
+        ('binary decode', lambda: decode(binary_message)),
+        ('binary raw unpack', lambda: FRAME.unpack(binary_message))
+    ]
+
+    print(f"📏 Bytes on the wire: JSON {len(json_text.encode())}, binary {len(binary_message)}")
+    for name, func in cases:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        elapsed = time.perf_counter() - start
+        print(f"⏱️ {name:18s} {1e9 * elapsed / iterations:8.0f} ns/message")
+
+if __name__ == "__main__":
+    benchmark()
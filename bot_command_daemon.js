@@ -0,0 +1,95 @@
+// Resident command daemon for the robot
+// Runs next to bot_shell_client.js in node_path and accepts commands over a
+// local TCP socket (reached from the computer through `adb forward`), so each
+// setpoint skips adb shell, su and node startup.
+//
+// Framing, one request per line:  <seq>\t<command>[;<command>...]\n
+// Reply, one per request:         <seq>\tok\n  or  <seq>\terr <message>\n
+//
+// Usage: ./node bot_command_daemon.js [port] [--spawn-per-request]
+//   --spawn-per-request starts bot_shell_client.js for every request (like the
+//   adb path does) instead of keeping one instance fed through its stdin.
+
+var net = require('net');
+var path = require('path');
+var spawn = require('child_process').spawn;
+
+var port = parseInt(process.argv[2] || '8765', 10);
+var spawnPerRequest = process.argv.indexOf('--spawn-per-request') >= 0;
+var clientScript = path.join(__dirname, 'bot_shell_client.js');
+var bot = null;
+
+function startBot() {
+    var child = spawn(process.execPath, [clientScript], { cwd: __dirname, stdio: ['pipe', 'ignore', 'inherit'] });
+    function forget() {
+        if (bot === child) {
+            bot = null;  // Restarted on the next request
+        }
+    }
+    child.on('error', forget);  // Spawn failed (bad cwd or executable)
+    child.on('exit', forget);
+    child.stdin.on('error', forget);
+    bot = child;
+}
+
+function sendResident(commands, done) {
+    if (!bot) {
+        startBot();
+    }
+    bot.stdin.write(commands.join('\n') + '\n', function (err) {
+        done(err ? err.message : null);
+    });
+}
+
+function sendSpawned(commands, done) {
+    var finished = false;
+    function finish(error) {
+        if (!finished) {
+            finished = true;
+            done(error);
+        }
+    }
+
+    var child = spawn(process.execPath, [clientScript], { cwd: __dirname, stdio: ['pipe', 'ignore', 'inherit'] });
+    child.on('error', function (err) { finish(err.message); });
+    child.on('exit', function (code) { finish(code === 0 ? null : 'exit code ' + code); });
+    child.stdin.end(commands.join('\n') + '\n');
+}
+
+var send = spawnPerRequest ? sendSpawned : sendResident;
+
+net.createServer(function (socket) {
+    var buffer = '';
+    socket.setNoDelay(true);
+
+    socket.on('data', function (chunk) {
+        buffer += chunk.toString();
+        var newline;
+        while ((newline = buffer.indexOf('\n')) >= 0) {
+            var line = buffer.slice(0, newline);
+            buffer = buffer.slice(newline + 1);
+
+            var tab = line.indexOf('\t');
+            if (tab < 0) {
+                continue;
+            }
+            (function (seq, commands) {
+                if (commands.length === 0) {
+                    socket.write(seq + '\tok\n');  // Empty batch is a health check
+                    return;
+                }
+                try {
+                    send(commands, function (error) {
+                        socket.write(seq + (error ? '\terr ' + error : '\tok') + '\n');
+                    });
+                } catch (e) {
+                    socket.write(seq + '\terr ' + e.message + '\n');
+                }
+            })(line.slice(0, tab), line.slice(tab + 1).split(';').filter(function (cmd) { return cmd; }));
+        }
+    });
+
+    socket.on('error', function () {});
+}).listen(port, '127.0.0.1', function () {
+    console.log('bot_command_daemon listening on 127.0.0.1:' + port + (spawnPerRequest ? ' (spawn per request)' : ''));
+});
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Circuit Breaker for the robot transport
+Fails fast while the robot is unreachable and reconnects in the background
+"""
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class CircuitBreaker:
+    CLOSED = 'closed'  # robot reachable, commands go through
+    OPEN = 'open'  # robot unreachable, commands fail fast while we reconnect
+    RECOVERING = 'recovering'  # robot back, only the reconnect thread may send until on_recovery succeeds
+
+    def __init__(self, reconnect, probe, on_recovery=None, failure_threshold=2,
+                 initial_backoff=1.0, max_backoff=30.0):
+        self.reconnect = reconnect  # callable trying to re-establish the connection
+        self.probe = probe  # callable returning True when the robot answers
+        self.on_recovery = on_recovery  # callable run once the robot is back, returns True on success
+        self.failure_threshold = failure_threshold  # consecutive failures before opening
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+        self.reconnect_thread = None
+
+    def allow(self):
+        """Return True if a command should be attempted"""
+        if self.state == self.CLOSED:
+            return True
+        # While recovering, only the recovery action's own commands go through
+        return self.state == self.RECOVERING and threading.current_thread() is self.reconnect_thread
+
+    def record_success(self):
+        self.consecutive_failures = 0
+
+    def record_failure(self):
+        with self.lock:
+            self.consecutive_failures += 1
+            if self.state == self.CLOSED and self.consecutive_failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.time()
+                logger.warning(f"⚡ Robot unreachable after {self.consecutive_failures} failures - "
+                               f"failing fast and reconnecting in the background")
+                self.reconnect_thread = threading.Thread(target=self._reconnect_loop, daemon=True)
+                self.reconnect_thread.start()
+
+    def _reconnect_loop(self):
+        backoff = self.initial_backoff
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                self.reconnect()
+                healthy = self.probe()
+            except Exception as e:
+                logger.debug(f"Reconnect attempt {attempt} error: {e}")
+                healthy = False
+
+            if healthy and self._recover():
+                break
+
+            logger.info(f"🔄 Reconnect attempt {attempt} failed, retrying in {backoff:.0f}s")
+            time.sleep(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
+        outage = time.time() - self.opened_at
+        logger.info(f"✅ Robot reachable again after {outage:.1f}s")
+
+        with self.lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self.opened_at = None
+
+    def _recover(self):
+        """Run on_recovery with other senders held off, back to OPEN if it fails"""
+        if self.on_recovery is None:
+            return True
+
+        self.state = self.RECOVERING
+        try:
+            recovered = self.on_recovery()
+        except Exception as e:
+            logger.error(f"❌ Recovery action failed: {e}")
+            recovered = False
+
+        if not recovered:
+            self.state = self.OPEN
+        return bool(recovered)
+
+    def status(self):
+        return {
+            'state': self.state,
+            'consecutive_failures': self.consecutive_failures,
+            'open_for': time.time() - self.opened_at if self.opened_at else 0.0
+        }
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Command Queue for the robot HTTP controller
+Accepts commands immediately and applies them on a worker thread, latest wins.
+Every state change is kept as a numbered event so clients can long-poll for it.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+
+from tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+class CommandQueue:
+    def __init__(self, robot_controller, history=1000):
+        self.robot_controller = robot_controller
+        self.condition = threading.Condition()
+        self.pending = None  # the one command waiting to be applied
+        self.next_id = 1
+        self.seq = 0  # sequence number of the latest event
+        self.events = deque(maxlen=history)
+        self.last_applied = None
+        self.closed = False
+
+        self.worker = threading.Thread(target=self._run, daemon=True)
+        self.worker.start()
+
+    def submit(self, kind, **payload):
+        """Queue a 'command' or 'dual_wheel' request and return its event, replacing any unapplied one
+
+        Returns None once the queue is closed.
+        """
+        with self.condition:
+            if self.closed:
+                return None
+            if self.pending is not None:
+                self._record(self.pending, 'superseded')
+
+            command = dict(payload, id=self.next_id, kind=kind)
+            self.next_id += 1
+            self.pending = command
+            event = self._record(command, 'accepted')
+            self.condition.notify_all()
+            return event
+
+    def _record(self, command, status):
+        """Append an event; caller holds the condition"""
+        self.seq += 1
+        event = dict(command, seq=self.seq, status=status, timestamp=time.time())
+        self.events.append(event)
+        self.condition.notify_all()
+        return event
+
+    def _cooldown_remaining(self, command):
+        """Movement commands respect the controller's rate limit instead of being dropped by it"""
+        if command['kind'] != 'command':
+            return 0
+        robot = self.robot_controller
+        return robot.last_command_time + robot.command_cooldown - time.time()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.closed:
+                    if self.pending is None:
+                        self.condition.wait()
+                        continue
+                    # Wait out the cooldown; a newer command may supersede this one meanwhile
+                    remaining = self._cooldown_remaining(self.pending)
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(timeout=remaining)
+
+                if self.closed:
+                    return
+                command = self.pending
+                self.pending = None
+
+            with tracer.span('apply_command', id=command['id'], kind=command['kind']):
+                try:
+                    if command['kind'] == 'command':
+                        success = self.robot_controller.execute_movement(command['command'])
+                    else:
+                        success = self.robot_controller.send_dual_wheel(command['left_speed'], command['right_speed'])
+                        if success:
+                            # The next named command must be sent, not skipped as a repeat
+                            self.robot_controller.last_command = None
+                except Exception as e:
+                    logger.error(f"❌ Command {command['id']} error: {e}")
+                    success = False
+
+            with self.condition:
+                event = self._record(command, 'applied' if success else 'failed')
+                if success:
+                    self.last_applied = event
+
+    def events_since(self, since=None, timeout=0.0):
+        """Events newer than seq `since`, waiting up to timeout seconds for one to arrive"""
+        with self.condition:
+            if since is not None:
+                self.condition.wait_for(lambda: self.seq > since or self.closed, timeout=timeout)
+            events = [event for event in self.events if since is None or event['seq'] > since]
+            return {
+                'seq': self.seq,
+                'events': events,
+                'pending': self.pending['id'] if self.pending else None,
+                'last_applied': self.last_applied
+            }
+
+    def close(self, timeout=5.0):
+        """Stop accepting commands and wait for the one being applied to finish"""
+        with self.condition:
+            self.closed = True
+            if self.pending is not None:
+                self._record(self.pending, 'cancelled')
+                self.pending = None
+            self.condition.notify_all()
+
+        self.worker.join(timeout)
+        if self.worker.is_alive():
+            logger.warning(f"⚠️ Command still being applied after {timeout:.0f}s")
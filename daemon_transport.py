@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Daemon Transport
+Talks to bot_command_daemon.js on the robot over a local TCP socket
+(forwarded with `adb forward tcp:PORT tcp:PORT`), one request/ack per command batch.
+
+Run with --serve to start a local stand-in daemon for testing without a robot.
+"""
+
+import argparse
+import logging
+import select
+import socket
+import socketserver
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8765
+
+class DaemonTransport:
+    def __init__(self, host='127.0.0.1', port=DEFAULT_PORT, timeout=1.0, ack_timeout=5.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout  # seconds to wait for connect
+        self.ack_timeout = ack_timeout  # seconds to wait for each ack, room for node startup with --spawn-per-request
+        self.sock = None
+        self.reader = None
+        self.seq = 0
+        self.lock = threading.Lock()
+        self.retry_delay = 5.0  # seconds to wait before reconnecting after a failure
+        self.retry_after = 0
+
+    def connect(self):
+        self.sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile('r', encoding='utf-8', newline='\n')
+
+        # adb forward accepts the connection even when nothing listens on the robot,
+        # so make sure the daemon answers before trusting it with commands
+        self.seq += 1
+        self.sock.sendall(f"{self.seq}\t\n".encode('utf-8'))
+        if self.reader.readline() != f"{self.seq}\tok\n":
+            self.close()
+            raise ConnectionError("daemon did not answer the health check")
+        self.sock.settimeout(self.ack_timeout)
+        logger.info(f"🔌 Connected to command daemon on {self.host}:{self.port}")
+
+    def close(self):
+        if self.sock is not None:
+            try:
+                self.reader.close()
+                self.sock.close()
+            except OSError:
+                pass
+        self.sock = None
+        self.reader = None
+
+    def closed_by_daemon(self):
+        """True if the daemon hung up since the last request (e.g. it was restarted)"""
+        readable, _, _ = select.select([self.sock], [], [], 0)
+        return bool(readable) and self.sock.recv(1, socket.MSG_PEEK) == b''
+
+    def send(self, commands):
+        """Send a batch of bot commands and wait for the daemon's ack
+
+        Returns True on an ok ack, None when the request couldn't be written (safe
+        to send another way), and False once it was written but failed: an error
+        ack, or no ack before the timeout. The batch may have run then, so it
+        mustn't be resent.
+        """
+        with self.lock:
+            if self.sock is None and time.monotonic() < self.retry_after:
+                return None
+
+            try:
+                if self.sock is not None and self.closed_by_daemon():
+                    self.close()
+                if self.sock is None:
+                    self.connect()
+
+                self.seq += 1
+                seq = str(self.seq)
+                self.sock.sendall(f"{seq}\t{';'.join(commands)}\n".encode('utf-8'))
+            except OSError as e:
+                logger.debug(f"Daemon transport error: {e}")
+                self.close()
+                self.retry_after = time.monotonic() + self.retry_delay
+                return None
+
+            try:
+                while True:
+                    line = self.reader.readline()
+                    if not line:
+                        raise ConnectionError("daemon closed the connection")
+                    reply_seq, _, status = line.rstrip('\n').partition('\t')
+                    if reply_seq == seq:
+                        break  # Older replies belong to requests that timed out
+
+                if status != 'ok':
+                    logger.error(f"❌ Daemon rejected {commands}: {status}")
+                    return False
+                return True
+
+            except (OSError, ConnectionError) as e:
+                # The daemon may have run the batch, so report a failure rather than fall back
+                logger.error(f"❌ No ack from daemon for {commands}: {e}")
+                self.close()
+                self.retry_after = time.monotonic() + self.retry_delay
+                return False
+
+    def ping(self):
+        """An empty batch checks the daemon is up without moving anything"""
+        return self.send([]) is True
+
+class StandInDaemonHandler(socketserver.StreamRequestHandler):
+    """Local stand-in for bot_command_daemon.js: acks every request and logs the commands"""
+
+    def handle(self):
+        for line in self.rfile:
+            seq, _, batch = line.decode('utf-8').rstrip('\n').partition('\t')
+            commands = [cmd for cmd in batch.split(';') if cmd]
+            if commands:
+                logger.info(f"🤖 Stand-in daemon received: {'; '.join(commands)}")
+            self.wfile.write(f"{seq}\tok\n".encode('utf-8'))
+
+class StandInDaemon(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, port=DEFAULT_PORT):
+        super().__init__(('127.0.0.1', port), StandInDaemonHandler)
+
+def main():
+    """Main function with command line argument parsing"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='Robot command daemon transport')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'Daemon port (default: {DEFAULT_PORT})')
+    parser.add_argument('--serve', action='store_true', help='Run a local stand-in daemon')
+    parser.add_argument('--ping', action='store_true', help='Check that the daemon answers')
+
+    args = parser.parse_args()
+
+    if args.serve:
+        server = StandInDaemon(args.port)
+        logger.info(f"🧪 Stand-in command daemon listening on 127.0.0.1:{args.port}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            logger.info("🛑 Stand-in daemon stopped")
+    elif args.ping:
+        if DaemonTransport(port=args.port).ping():
+            print(f"✅ Command daemon answering on port {args.port}")
+        else:
+            print(f"❌ No command daemon on port {args.port}")
+            raise SystemExit(1)
+    else:
+        parser.print_help()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+#!/bin/bash
+
+# Deploy the resident command daemon to the robot
+# Pushes bot_command_daemon.js next to bot_shell_client.js, starts it and
+# forwards its port so robot_controller.py can reach it over local TCP
+
+ROBOT_IP="172.16.215.191"
+NODE_PATH="/data/data/com.ohmnilabs.telebot_rtc/files/assets/node-files"
+DAEMON_PORT="${ROBOT_DAEMON_PORT:-8765}"
+
+cd "$(dirname "$0")"
+
+echo "🤖 Deploying Robot Command Daemon"
+echo "================================="
+echo "Robot IP: $ROBOT_IP"
+echo "Daemon Port: $DAEMON_PORT"
+echo ""
+
+# Check if ADB is available
+if ! command -v adb &> /dev/null; then
+    echo "❌ ADB is not installed or not in PATH"
+    echo "Please install Android Debug Bridge (ADB)"
+    exit 1
+fi
+
+# Check ADB connection
+echo "📱 Checking ADB connection to robot..."
+if ! adb devices | grep -q "$ROBOT_IP"; then
+    echo "⚠️  Robot not found. Attempting to connect..."
+    adb connect $ROBOT_IP:5555
+    sleep 3
+
+    if ! adb devices | grep -q "$ROBOT_IP"; then
+        echo "❌ Could not connect to robot at $ROBOT_IP"
+        exit 1
+    fi
+fi
+echo "✅ Connected to robot"
+
+# Push the daemon (via /data/local/tmp, node_path is only writable as root)
+echo "📦 Pushing bot_command_daemon.js..."
+adb push bot_command_daemon.js /data/local/tmp/bot_command_daemon.js > /dev/null || exit 1
+adb shell "su -c 'cp /data/local/tmp/bot_command_daemon.js $NODE_PATH/ && chmod 644 $NODE_PATH/bot_command_daemon.js'"
+
+# Restart the daemon so a new version takes over
+echo "🔄 Starting daemon on the robot..."
+adb shell "su -c 'pkill -f bot_command_daemon.js'" > /dev/null 2>&1
+adb shell "su -c 'cd $NODE_PATH && nohup ./node bot_command_daemon.js $DAEMON_PORT > /dev/null 2>&1 &'"
+sleep 2
+
+# Forward the daemon port to this computer
+echo "🔀 Forwarding tcp:$DAEMON_PORT..."
+adb forward tcp:$DAEMON_PORT tcp:$DAEMON_PORT || exit 1
+
+if python3 daemon_transport.py --ping --port $DAEMON_PORT; then
+    echo ""
+    echo "🚀 Daemon ready. Start the controller with:"
+    echo "   ROBOT_DAEMON_PORT=$DAEMON_PORT python3 robot_controller.py"
+else
+    echo "❌ Daemon did not answer. Commands will keep using adb shell."
+    exit 1
+fi
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Headless Red Cap Follower
+Reads frames from a video file, an image directory or a raw RGB pipe,
+detects red objects and drives the robot without a browser
+"""
+
+import argparse
+import logging
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from adaptive_scheduler import AdaptiveDetectionScheduler
+from red_cap_detector import HSVRange, RedCapDetector
+from target_tracker import TargetTracker
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.ppm', '.pnm')
+
+def raw_rgb_frames(stream, width, height):
+    """Yield HxWx3 frames from a stream of packed rgb24 bytes"""
+    frame_size = width * height * 3
+    while True:
+        data = stream.read(frame_size)
+        if len(data) < frame_size:
+            return
+        yield np.frombuffer(data, dtype=np.uint8).reshape(height, width, 3)
+
+def ffmpeg_decode_command(path, width, height, single_frame=False):
+    """Build an ffmpeg command that decodes path to rgb24 on stdout"""
+    cmd = ['ffmpeg', '-loglevel', 'error', '-i', path]
+    if single_frame:
+        cmd += ['-frames:v', '1']
+    cmd += ['-vf', f'scale={width}:{height}', '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-']
+    return cmd
+
+def video_file_frames(path, width, height):
+    """Yield frames from a video file decoded by ffmpeg"""
+    process = subprocess.Popen(ffmpeg_decode_command(path, width, height), stdout=subprocess.PIPE)
+    try:
+        yield from raw_rgb_frames(process.stdout, width, height)
+    finally:
+        process.stdout.close()
+        process.kill()
+        process.wait()
+
+def read_ppm(path):
+    """Read a binary (P6) PPM file without ffmpeg"""
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    fields = []
+    pos = 0
+    while len(fields) < 4:
+        while data[pos:pos + 1].isspace():
+            pos += 1
+        if data[pos:pos + 1] == b'#':
+            pos = data.index(b'\n', pos)
+            continue
+        end = pos
+        while not data[end:end + 1].isspace():
+            end += 1
+        fields.append(data[pos:end])
+        pos = end
+    pos += 1  # Single whitespace before pixel data
+
+    if fields[0] != b'P6' or int(fields[3]) > 255:
+        raise ValueError(f"Unsupported PPM file: {path}")
+
+    width, height = int(fields[1]), int(fields[2])
+    return np.frombuffer(data, dtype=np.uint8, count=width * height * 3, offset=pos).reshape(height, width, 3)
+
+def image_directory_frames(directory, width, height):
+    """Yield frames from the images in a directory, in name order"""
+    names = sorted(name for name in os.listdir(directory) if name.lower().endswith(IMAGE_EXTENSIONS))
+    for name in names:
+        path = os.path.join(directory, name)
+        if name.lower().endswith(('.ppm', '.pnm')):
+            frame = read_ppm(path)
+            if frame.shape[:2] == (height, width):
+                yield frame
+                continue
+
+        result = subprocess.run(ffmpeg_decode_command(path, width, height, single_frame=True),
+                                capture_output=True, timeout=10)
+        if result.returncode != 0 or len(result.stdout) < width * height * 3:
+            logger.warning(f"⚠️ Could not decode image: {path}")
+            continue
+        yield np.frombuffer(result.stdout, dtype=np.uint8, count=width * height * 3).reshape(height, width, 3)
+
+def open_frame_source(source, width, height):
+    """Pick a frame source: '-' for a raw rgb24 pipe on stdin, a directory of images, or a video file"""
+    if source == '-':
+        return raw_rgb_frames(sys.stdin.buffer, width, height)
+    if os.path.isdir(source):
+        return image_directory_frames(source, width, height)
+    return video_file_frames(source, width, height)
+
+class FramePacer:
+    """Holds the pipeline to a target frame rate (fps <= 0 means as fast as possible)"""
+
+    def __init__(self, fps):
+        self.interval = 1.0 / fps if fps > 0 else 0
+        self.next_frame_time = None
+
+    def wait(self):
+        if not self.interval:
+            return
+
+        now = time.monotonic()
+        if self.next_frame_time is None:
+            self.next_frame_time = now
+        elif now < self.next_frame_time:
+            time.sleep(self.next_frame_time - now)
+        else:
+            # Running late, don't try to catch up with a burst of frames
+            self.next_frame_time = now
+
+        self.next_frame_time += self.interval
+
+class HeadlessFollower:
+    def __init__(self, detector, robot=None, follow_distance=50, scheduler=None, tracker=None):
+        self.detector = detector
+        self.scheduler = scheduler
+        self.tracker = tracker
+        self.robot = robot
+        self.follow_distance = follow_distance  # cm
+        self.tolerance = 15  # cm
+        self.dead_zone = 0.15  # fraction of half frame width
+        self.last_command = None
+
+        # Pipeline metrics
+        self.frames = 0
+        self.frames_with_target = 0
+        self.processing_time = 0.0
+
+    def decide_command(self, target, frame_width):
+        """Choose a movement command for the target, same rules as the browser follower"""
+        if target is None:
+            return 'stop'
+
+        distance = self.detector.calculate_distance(target['width'])
+        if not distance:
+            return 'stop'
+
+        frame_center_x = frame_width / 2
+        offset_percent = (target['center_x'] - frame_center_x) / frame_center_x
+
+        # Distance control (forward/backward) - prioritize distance first
+        if distance < self.follow_distance - self.tolerance:
+            return 'backward'
+        if distance > self.follow_distance + self.tolerance:
+            return 'forward'
+
+        # Good distance, adjust horizontal position
+        if abs(offset_percent) > self.dead_zone:
+            return 'right' if offset_percent > 0 else 'left'
+        return 'stop'
+
+    def process_frame(self, frame):
+        """Detect, decide and (optionally) drive the robot for one frame"""
+        start = time.perf_counter()
+
+        objects = (self.scheduler or self.detector).find_red_objects(frame)
+
+        if self.tracker is not None:
+            # Skipped frames only advance the prediction, they don't re-feed stale detections
+            now = time.monotonic()
+            if self.scheduler is None or self.scheduler.fresh:
+                self.tracker.update(objects, now)
+            target = self.tracker.target(now)
+        else:
+            target = objects[0] if objects else None  # Follow largest red object
+        command = self.decide_command(target, frame.shape[1])
+
+        if self.robot is not None:
+            self.robot.execute_movement(command)
+
+        if command != self.last_command:
+            logger.info(f"🎯 Command: {command} ({len(objects)} red object(s))")
+            self.last_command = command
+
+        self.frames += 1
+        if target is not None:
+            self.frames_with_target += 1
+        self.processing_time += time.perf_counter() - start
+
+        return command
+
+    def run(self, frames, fps=15, report_interval=5.0):
+        """Run the pipeline over a frame iterator"""
+        pacer = FramePacer(fps)
+        start = time.monotonic()
+        last_report = start
+
+        for frame in frames:
+            pacer.wait()
+            self.process_frame(frame)
+
+            now = time.monotonic()
+            if now - last_report >= report_interval:
+                self.log_metrics(now - start)
+                last_report = now
+
+        self.log_metrics(time.monotonic() - start)
+        return self.metrics(time.monotonic() - start)
+
+    def metrics(self, elapsed):
+        metrics = {
+            'frames': self.frames,
+            'frames_with_target': self.frames_with_target,
+            'elapsed': elapsed,
+            'fps': self.frames / elapsed if elapsed > 0 else 0.0,
+            'avg_processing_ms': 1000 * self.processing_time / self.frames if self.frames else 0.0
+        }
+        if self.scheduler is not None:
+            metrics['operating_point'] = self.scheduler.metrics()
+        return metrics
+
+    def log_metrics(self, elapsed):
+        m = self.metrics(elapsed)
+        logger.info(f"📊 {m['frames']} frames in {m['elapsed']:.1f}s - {m['fps']:.1f} fps, "
+                    f"{m['avg_processing_ms']:.1f}ms/frame, target in {m['frames_with_target']} frames")
+        if 'operating_point' in m:
+            op = m['operating_point']
+            logger.info(f"⚙️ Operating point: scale 1/{op['scale']}, every {op['skip']} frame(s), "
+                        f"detection {op['avg_processing_ms']:.1f}ms (budget {op['latency_budget_ms']:.0f}ms)")
+
+def main():
+    """Main function with command line argument parsing"""
+    parser = argparse.ArgumentParser(description='Headless Red Cap Follower')
+    parser.add_argument('source', help="Video file, image directory, or '-' for raw rgb24 frames on stdin")
+    parser.add_argument('--width', type=int, default=640, help='Frame width (default: 640)')
+    parser.add_argument('--height', type=int, default=480, help='Frame height (default: 480)')
+    parser.add_argument('--fps', type=float, default=15, help='Target frame rate, 0 for as fast as possible (default: 15)')
+    parser.add_argument('--no-robot', action='store_true', help="Don't drive the robot, only run detection")
+    parser.add_argument('--red-sensitivity', type=int, default=40, help='Red sensitivity (default: 40)')
+    parser.add_argument('--min-object-size', type=int, default=500, help='Min object size in pixels (default: 500)')
+    parser.add_argument('--hsv-range', type=float, nargs=2, metavar=('HUE_MIN', 'HUE_MAX'),
+                        help='Track a hue range in degrees instead of the red rules (e.g. 200 250 for blue)')
+    parser.add_argument('--lut-bits', type=int, default=8, choices=range(4, 9),
+                        help='Bits per channel in the color lookup table, fewer is smaller but approximate (default: 8, exact)')
+    parser.add_argument('--follow-distance', type=float, default=50, help='Follow distance in cm (default: 50)')
+    parser.add_argument('--focal-length', type=float, help='Calibrated camera focal length')
+    parser.add_argument('--track', action='store_true', help='Follow a Kalman-tracked target instead of the largest blob per frame')
+    parser.add_argument('--adaptive', action='store_true', help='Adapt detection resolution and frame skip to a latency budget')
+    parser.add_argument('--latency-budget', type=float, help='Detection latency budget in ms (default: one frame interval, or 33ms)')
+
+    args = parser.parse_args()
+
+    color_model = HSVRange(*args.hsv_range) if args.hsv_range else None
+    detector = RedCapDetector(red_sensitivity=args.red_sensitivity, min_object_size=args.min_object_size,
+                              color_model=color_model, lut_bits=args.lut_bits)
+    if args.focal_length:
+        detector.focal_length = args.focal_length
+        detector.is_calibrated = True
+
+    robot = None
+    if not args.no_robot:
+        from robot_controller import RobotController
+        robot = RobotController()
+
+    scheduler = None
+    if args.adaptive:
+        budget_ms = args.latency_budget or (1000 / args.fps if args.fps > 0 else 33)
+        scheduler = AdaptiveDetectionScheduler(detector, latency_budget=budget_ms / 1000)
+
+    tracker = TargetTracker() if args.track else None
+
+    follower = HeadlessFollower(detector, robot=robot, follow_distance=args.follow_distance,
+                                scheduler=scheduler, tracker=tracker)
+    mode = 'as fast as possible' if args.fps <= 0 else f'{args.fps:g} fps'
+    logger.info(f"🔴 Headless follower reading {args.source} ({args.width}x{args.height}, {mode})")
+
+    try:
+        follower.run(open_frame_source(args.source, args.width, args.height), fps=args.fps)
+    except KeyboardInterrupt:
+        logger.info("🛑 Shutdown requested...")
+    finally:
+        if robot is not None:
+            robot.shutdown()
+        logger.info("👋 Headless follower stopped")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Red Cap Detector
+Python port of the red object detection used by red_cap_follower.html
+"""
+
+import logging
+
+import numpy as np
+
+try:
+    from scipy import ndimage
+except ImportError:  # scipy is optional, fall back to a pure Python flood fill
+    ndimage = None
+
+logger = logging.getLogger(__name__)
+
+class HSVRange:
+    """Color model matching a hue/saturation/value range
+
+    Hue is in degrees (0-360, hue_min > hue_max wraps through 0),
+    saturation and value are in 0-1.
+    """
+
+    def __init__(self, hue_min, hue_max, sat_min=0.4, sat_max=1.0, val_min=0.3, val_max=1.0):
+        self.params = (hue_min, hue_max, sat_min, sat_max, val_min, val_max)
+
+    def classify(self, r, g, b):
+        """Return a boolean array for float RGB arrays in 0-255"""
+        hue_min, hue_max, sat_min, sat_max, val_min, val_max = self.params
+
+        max_c = np.maximum(np.maximum(r, g), b)
+        min_c = np.minimum(np.minimum(r, g), b)
+        delta = max_c - min_c
+        safe_delta = np.where(delta == 0, 1, delta)
+
+        hue = np.where(max_c == r, ((g - b) / safe_delta) % 6,
+                       np.where(max_c == g, (b - r) / safe_delta + 2, (r - g) / safe_delta + 4)) * 60
+        sat = np.where(max_c == 0, 0, delta / np.where(max_c == 0, 1, max_c))
+        val = max_c / 255
+
+        if hue_min <= hue_max:
+            in_hue = (hue >= hue_min) & (hue <= hue_max)
+        else:
+            in_hue = (hue >= hue_min) | (hue <= hue_max)
+
+        return (delta > 0) & in_hue & (sat >= sat_min) & (sat <= sat_max) & (val >= val_min) & (val <= val_max)
+
+class RedCapDetector:
+    def __init__(self, red_sensitivity=40, min_object_size=500, color_model=None, lut_bits=8):
+        # Red detection parameters (same defaults as the browser follower)
+        self.red_sensitivity = red_sensitivity
+        self.min_object_size = min_object_size
+
+        # Pixel classification: color_model=None uses the red rules, otherwise
+        # any object with classify(r, g, b) and a hashable params attribute (e.g. HSVRange)
+        self.color_model = color_model
+        self.lut_bits = lut_bits  # bits per channel in the lookup table, fewer than 8 approximates the rules
+        self._lut = None
+        self._lut_key = None
+
+        # Distance parameters
+        self.average_cap_width = 200  # Average cap width in mm
+        self.focal_length = 500  # Camera focal length (estimated)
+        self.is_calibrated = False
+        self.calibration_distance = 100  # cm
+
+        # Build the table now rather than inside the first (timed) detection
+        self.lookup_table()
+
+    def set_color_settings(self, red_sensitivity=None, color_model=None, lut_bits=None):
+        """Change the color settings and rebuild the lookup table right away"""
+        if red_sensitivity is not None:
+            self.red_sensitivity = red_sensitivity
+        if color_model is not None:
+            self.color_model = color_model
+        if lut_bits is not None:
+            self.lut_bits = lut_bits
+        self.lookup_table()
+
+    def is_red_pixel(self, r, g, b):
+        """Red rules from the browser follower, on scalars or arrays"""
+        # Multiple red detection methods for better accuracy
+        method1 = (r > 100) & (r > g * 1.5) & (r > b * 1.5)  # Basic red
+        method2 = (r > 120) & (g < 80) & (b < 80)  # Pure red
+        method3 = ((r - g) > self.red_sensitivity) & ((r - b) > self.red_sensitivity)  # Red dominance
+
+        return method1 | method2 | method3
+
+    def lookup_table(self):
+        """Return the color lookup table, rebuilding it when the color settings change"""
+        if self.color_model is None:
+            key = (self.lut_bits, 'red', self.red_sensitivity)
+        else:
+            key = (self.lut_bits, type(self.color_model).__name__, self.color_model.params)
+
+        if key != self._lut_key:
+            levels = 1 << self.lut_bits
+            step = 256 // levels
+            # Classify each quantization bin by its center value, one red plane at a
+            # time so the float temporaries stay at levels^2 instead of levels^3
+            centers = np.arange(levels, dtype=np.float32) * step + (step - 1) / 2
+            g, b = np.meshgrid(centers, centers, indexing='ij')
+            classify = self.is_red_pixel if self.color_model is None else self.color_model.classify
+
+            lut = np.empty((levels, levels, levels), dtype=bool)
+            for i, r in enumerate(centers):
+                lut[i] = classify(r, g, b)
+
+            self._lut = lut.ravel()
+            self._lut_key = key
+            logger.debug(f"Rebuilt color lookup table ({levels}^3 entries)")
+
+        return self._lut
+
+    def red_mask(self, frame):
+        """Return a boolean mask of matching pixels for an HxWx3 RGB uint8 frame"""
+        lut = self.lookup_table()
+        bits = self.lut_bits
+
+        # Quantize in uint8, then pack the three channels into one table index in place
+        quantized = frame >> (8 - bits) if bits < 8 else frame
+        index = quantized[..., 0].astype(np.uint32)
+        index <<= bits
+        index |= quantized[..., 1]
+        index <<= bits
+        index |= quantized[..., 2]
+
+        return np.take(lut, index)
+
+    def find_red_objects(self, frame, scale=1):
+        """Detect red objects in a frame, largest first
+
+        With scale > 1 only every scale-th pixel in each direction is analysed;
+        results are reported in full-frame coordinates and pixel areas.
+        """
+        if scale > 1:
+            frame = frame[::scale, ::scale]
+        mask = self.red_mask(frame)
+
+        if ndimage is not None:
+            objects = self._label_components(mask)
+        else:
+            objects = self._flood_fill_components(mask)
+
+        if scale > 1:
+            objects = [self._rescale_object(obj, scale) for obj in objects]
+
+        objects = [obj for obj in objects if obj['area'] > self.min_object_size]
+
+        # Sort by size (largest first)
+        return sorted(objects, key=lambda obj: obj['area'], reverse=True)
+
+    def _label_components(self, mask):
+        """Find 4-connected components with scipy"""
+        labels, count = ndimage.label(mask)
+        if count == 0:
+            return []
+
+        areas = np.bincount(labels.ravel())
+        objects = []
+        for label, slices in enumerate(ndimage.find_objects(labels), start=1):
+            if slices is None:
+                continue
+            ys, xs = slices
+            objects.append(self._make_object(xs.start, ys.start, xs.stop - 1, ys.stop - 1, int(areas[label])))
+
+        return objects
+
+    def _flood_fill_components(self, mask):
+        """Find 4-connected components with an explicit stack"""
+        height, width = mask.shape
+        flat = mask.ravel().tolist()
+        visited = bytearray(width * height)
+        objects = []
+
+        for y in range(0, height, 2):  # Skip pixels for performance
+            for x in range(0, width, 2):
+                index = y * width + x
+                if not flat[index] or visited[index]:
+                    continue
+
+                stack = [index]
+                visited[index] = 1
+                min_x = max_x = x
+                min_y = max_y = y
+                area = 0
+
+                while stack:
+                    current = stack.pop()
+                    cy, cx = divmod(current, width)
+                    area += 1
+
+                    min_x = min(min_x, cx)
+                    max_x = max(max_x, cx)
+                    min_y = min(min_y, cy)
+                    max_y = max(max_y, cy)
+
+                    # Add neighbors
+                    for neighbor, inside in ((current + 1, cx + 1 < width), (current - 1, cx > 0),
+                                             (current + width, cy + 1 < height), (current - width, cy > 0)):
+                        if inside and flat[neighbor] and not visited[neighbor]:
+                            visited[neighbor] = 1
+                            stack.append(neighbor)
+
+                objects.append(self._make_object(min_x, min_y, max_x, max_y, area))
+
+        return objects
+
+    @staticmethod
+    def _make_object(min_x, min_y, max_x, max_y, area):
+        return {
+            'x': min_x,
+            'y': min_y,
+            'width': max_x - min_x,
+            'height': max_y - min_y,
+            'center_x': (min_x + max_x) / 2,
+            'center_y': (min_y + max_y) / 2,
+            'area': area
+        }
+
+    @staticmethod
+    def _rescale_object(obj, scale):
+        return {
+            'x': obj['x'] * scale,
+            'y': obj['y'] * scale,
+            'width': obj['width'] * scale,
+            'height': obj['height'] * scale,
+            'center_x': obj['center_x'] * scale,
+            'center_y': obj['center_y'] * scale,
+            'area': obj['area'] * scale * scale
+        }
+
+    def calculate_distance(self, object_width_in_pixels):
+        """Estimate distance to an object in cm from its width in pixels"""
+        if not object_width_in_pixels or object_width_in_pixels < 10:
+            return None
+
+        distance = (self.average_cap_width * self.focal_length) / object_width_in_pixels
+        return distance / 10  # Convert mm to cm
+
+    def calibrate_distance(self, objects):
+        """Calibrate focal length with the largest object at calibration_distance"""
+        if not objects:
+            logger.warning("❌ No red objects detected for calibration")
+            return False
+
+        largest = objects[0]
+        self.focal_length = (largest['width'] * self.calibration_distance * 10) / self.average_cap_width
+        self.is_calibrated = True
+        logger.info(f"✅ Distance calibrated at {self.calibration_distance}cm!")
+        return True
@@ -8,17 +8,26 @@ import subprocess
 import sys
 import time
 import os
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
 import json
 import threading
 import logging
 
+from circuit_breaker import CircuitBreaker
+from command_queue import CommandQueue
+from daemon_transport import DaemonTransport
+from tracing import tracer
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+MOVEMENT_COMMANDS = ('forward', 'backward', 'left', 'right', 'stop')
+STATUS_POLL_MAX_TIMEOUT = 30  # seconds a /robot/status long-poll may wait
+
 class RobotController:
-    def __init__(self):
+    def __init__(self, daemon_port=None):
         self.robot_ip = "172.16.215.191"
         self.node_path = "/data/data/com.ohmnilabs.telebot_rtc/files/assets/node-files"
         self.power = 2000
@@ -26,6 +35,17 @@ class RobotController:
         self.last_command = None
         self.command_cooldown = 0.3  # seconds between commands
         self.last_command_time = 0
+        self.torque_state = {}  # motor -> 'on'/'off', resent after a reconnect
+        
+        # Resident command daemon on the robot (see deploy_command_daemon.sh),
+        # falls back to adb shell when it's not reachable
+        if daemon_port is None:
+            daemon_port = int(os.environ.get('ROBOT_DAEMON_PORT') or 0) or None
+        self.daemon = DaemonTransport(port=daemon_port) if daemon_port else None
+        
+        # Fail fast while the robot is unreachable, reconnect in the background
+        self.breaker = CircuitBreaker(reconnect=self.reconnect, probe=self.probe,
+                                      on_recovery=self.restore_safe_state)
         
         # Initialize robot on startup
         self.initialize_robot()
@@ -41,51 +61,136 @@ class RobotController:
         except Exception as e:
             logger.error(f"❌ Robot initialization failed: {e}")
     
+    def reconnect(self):
+        """Re-establish the ADB connection to the robot"""
+        subprocess.run(['adb', 'connect', f'{self.robot_ip}:5555'], capture_output=True, text=True, timeout=5)
+        if self.daemon is not None:
+            port = f'tcp:{self.daemon.port}'
+            subprocess.run(['adb', 'forward', port, port], capture_output=True, text=True, timeout=5)
+    
+    def probe(self):
+        """Check that the robot answers over ADB"""
+        result = subprocess.run(['adb', 'shell', 'echo', 'ok'], capture_output=True, text=True, timeout=3)
+        return result.returncode == 0 and 'ok' in result.stdout
+    
+    def restore_safe_state(self):
+        """After a reconnect, stop the wheels and resend the last torque settings"""
+        logger.info("🛡️ Restoring safe state after reconnect...")
+        for motor, state in sorted(self.torque_state.items()):
+            if not self.send_command(f"torque {motor} {state}"):
+                return False
+        if not self.send_dual_wheel(0, 0):
+            return False
+        self.last_command = 'stop'
+        return True
+    
+    def transport_available(self):
+        """Fail fast instead of waiting for a timeout while the robot is unreachable"""
+        if self.breaker.allow():
+            return True
+        tracer.annotate(result='circuit_open')
+        logger.debug("⚡ Robot unreachable, command dropped")
+        return False
+    
+    def send_via_daemon(self, commands):
+        """Try the resident daemon first, returns None so callers fall back to adb shell
+
+        Only an unreachable daemon falls back. An error ack means the daemon got the
+        batch and may have partly run it, so resending over adb could run it twice.
+        """
+        if self.daemon is None:
+            return None
+        with tracer.span('daemon_send', commands=len(commands)):
+            sent = self.daemon.send(commands)
+        if sent is None:
+            logger.debug("Command daemon unavailable, falling back to adb shell")
+        elif sent:
+            self.breaker.record_success()
+        return sent
+    
+    @tracer.traced('send_command')
     def send_command(self, cmd):
         """Send command to robot via ADB"""
+        parts = cmd.split()
+        if len(parts) == 3 and parts[0] == 'torque':
+            self.torque_state[parts[1]] = parts[2]
+        
+        if not self.transport_available():
+            return False
+        
+        sent = self.send_via_daemon([cmd])
+        if sent is not None:
+            if sent:
+                logger.debug(f"✅ Command sent: {cmd}")
+            return sent
+        
         try:
             full_cmd = f"adb shell \"su -c 'cd {self.node_path} && echo \\\"{cmd}\\\" | ./node bot_shell_client.js'\""
-            result = subprocess.run(full_cmd, shell=True, capture_output=True, text=True, timeout=5)
+            # adb round trip, su and node startup all happen inside this subprocess
+            with tracer.span('adb_subprocess', cmd=cmd):
+                result = subprocess.run(full_cmd, shell=True, capture_output=True, text=True, timeout=5)
             
             if result.returncode == 0:
                 logger.debug(f"✅ Command sent: {cmd}")
+                self.breaker.record_success()
                 return True
             else:
                 logger.error(f"❌ Command failed: {cmd} - {result.stderr}")
+                self.breaker.record_failure()
                 return False
         except subprocess.TimeoutExpired:
             logger.error(f"⏱️ Command timeout: {cmd}")
+            self.breaker.record_failure()
             return False
         except Exception as e:
             logger.error(f"❌ Command error: {cmd} - {e}")
+            self.breaker.record_failure()
             return False
     
+    @tracer.traced('send_dual_wheel')
     def send_dual_wheel(self, left_speed, right_speed):
         """Send synchronized wheel commands for precise movement"""
+        if not self.transport_available():
+            return False
+        
+        sent = self.send_via_daemon([f"rot 0 {left_speed}", f"rot 1 {right_speed}"])
+        if sent is not None:
+            if sent:
+                logger.debug(f"✅ Dual wheel command: L:{left_speed}, R:{right_speed}")
+            return sent
+        
         try:
             cmd = f"adb shell \"su -c 'cd {self.node_path} && (echo \\\"rot 0 {left_speed}\\\"; echo \\\"rot 1 {right_speed}\\\") | ./node bot_shell_client.js'\""
-            result = subprocess.run(cmd, shell=True, capture_output=True, text=True, timeout=5)
+            with tracer.span('adb_subprocess', left_speed=left_speed, right_speed=right_speed):
+                result = subprocess.run(cmd, shell=True, capture_output=True, text=True, timeout=5)
             
             if result.returncode == 0:
                 logger.debug(f"✅ Dual wheel command: L:{left_speed}, R:{right_speed}")
+                self.breaker.record_success()
                 return True
             else:
                 logger.error(f"❌ Dual wheel command failed: {result.stderr}")
+                self.breaker.record_failure()
                 return False
         except Exception as e:
             logger.error(f"❌ Dual wheel error: {e}")
+            self.breaker.record_failure()
             return False
     
+    @tracer.traced('execute_movement')
     def execute_movement(self, command):
         """Execute movement command with rate limiting"""
         current_time = time.time()
+        tracer.annotate(command=command)
         
         # Rate limiting
         if current_time - self.last_command_time < self.command_cooldown:
+            tracer.annotate(result='rate_limited')
             return False
         
         # Don't repeat the same command
         if command == self.last_command:
+            tracer.annotate(result='repeat')
             return True
         
         success = False
@@ -130,34 +235,82 @@ class RobotController:
         logger.info("👋 Robot shutdown complete")
 
 class RobotHTTPHandler(BaseHTTPRequestHandler):
-    def __init__(self, robot_controller, *args, **kwargs):
+    def __init__(self, robot_controller, command_queue, *args, **kwargs):
         self.robot_controller = robot_controller
+        self.command_queue = command_queue
         super().__init__(*args, **kwargs)
     
+    def read_json_body(self):
+        """Read and parse the JSON request body"""
+        with tracer.span('read_body'):
+            content_length = int(self.headers['Content-Length'])
+            post_data = self.rfile.read(content_length)
+        with tracer.span('json_parse'):
+            return json.loads(post_data.decode('utf-8'))
+    
+    def send_json(self, status, response):
+        """Write a JSON response with CORS headers"""
+        with tracer.span('response_write', status=status):
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            
+            self.wfile.write(json.dumps(response).encode())
+    
+    def do_GET(self):
+        """Handle GET requests (command status and admin endpoints)"""
+        parsed_url = urlparse(self.path)
+        
+        if parsed_url.path == '/robot/status':
+            self.handle_status(parse_qs(parsed_url.query))
+        elif parsed_url.path == '/admin/trace':
+            # Download with: curl http://localhost:8081/admin/trace > trace.json
+            self.send_json(200, tracer.export_chrome_trace())
+        else:
+            self.send_error(404, "Endpoint not found")
+    
+    def handle_status(self, params):
+        """Long-poll for command events: /robot/status?since=<seq>&timeout=<seconds>
+
+        Without since, returns the buffered events right away. With since, waits
+        until an event newer than since exists or the timeout expires.
+        """
+        try:
+            since = int(params['since'][0]) if 'since' in params else None
+            timeout = min(float(params.get('timeout', [25])[0]), STATUS_POLL_MAX_TIMEOUT)
+        except ValueError:
+            self.send_error(400, "Invalid since or timeout")
+            return
+        
+        status = self.command_queue.events_since(since, timeout=timeout)
+        status['breaker'] = self.robot_controller.breaker.status()
+        status['timestamp'] = time.time()
+        self.send_json(200, status)
+    
+    def send_accepted(self, event):
+        """202 with the command id; the outcome is reported through /robot/status"""
+        if event is None:
+            self.send_error(503, "Controller is shutting down")
+            return
+        response = dict(event, status_url=f"/robot/status?since={event['seq']}")
+        self.send_json(202, response)
+    
     def do_POST(self):
         """Handle POST requests for robot commands"""
+        with tracer.span('do_POST', path=self.path):
+            self.handle_post()
+    
+    def handle_post(self):
         if self.path == '/robot/command':
             try:
-                content_length = int(self.headers['Content-Length'])
-                post_data = self.rfile.read(content_length)
-                data = json.loads(post_data.decode('utf-8'))
+                data = self.read_json_body()
                 
                 command = data.get('command')
-                if command:
-                    success = self.robot_controller.execute_movement(command)
-                    
-                    response = {
-                        'success': success,
-                        'command': command,
-                        'timestamp': time.time()
-                    }
-                    
-                    self.send_response(200 if success else 500)
-                    self.send_header('Content-Type', 'application/json')
-                    self.send_header('Access-Control-Allow-Origin', '*')
-                    self.end_headers()
-                    
-                    self.wfile.write(json.dumps(response).encode())
+                if command in MOVEMENT_COMMANDS:
+                    self.send_accepted(self.command_queue.submit('command', command=command))
+                elif command:
+                    self.send_error(400, f"Unknown command: {command}")
                 else:
                     self.send_error(400, "Missing command parameter")
                     
@@ -169,34 +322,37 @@ class RobotHTTPHandler(BaseHTTPRequestHandler):
                 
         elif self.path == '/robot/dual_wheel':
             try:
-                content_length = int(self.headers['Content-Length'])
-                post_data = self.rfile.read(content_length)
-                data = json.loads(post_data.decode('utf-8'))
-                
-                left_speed = data.get('left_speed', 0)
-                right_speed = data.get('right_speed', 0)
-                
-                success = self.robot_controller.send_dual_wheel(left_speed, right_speed)
-                
-                response = {
-                    'success': success,
-                    'left_speed': left_speed,
-                    'right_speed': right_speed,
-                    'timestamp': time.time()
-                }
+                data = self.read_json_body()
                 
-                self.send_response(200 if success else 500)
-                self.send_header('Content-Type', 'application/json')
-                self.send_header('Access-Control-Allow-Origin', '*')
-                self.end_headers()
+                left_speed = int(data.get('left_speed', 0))
+                right_speed = int(data.get('right_speed', 0))
                 
-                self.wfile.write(json.dumps(response).encode())
+                self.send_accepted(self.command_queue.submit('dual_wheel', left_speed=left_speed,
+                                                             right_speed=right_speed))
                 
             except json.JSONDecodeError:
                 self.send_error(400, "Invalid JSON")
+            except (ValueError, TypeError):
+                self.send_error(400, "Invalid wheel speeds")
             except Exception as e:
                 logger.error(f"Dual wheel request handling error: {e}")
                 self.send_error(500, str(e))
+                
+        elif self.path == '/admin/trace':
+            # Configure tracing, e.g. {"sample_rate": 0.1} to trace 10% of requests, {"clear": true}
+            try:
+                data = self.read_json_body()
+                tracer.configure(sample_rate=data.get('sample_rate'), capacity=data.get('capacity'))
+                if data.get('clear'):
+                    tracer.clear()
+                
+                self.send_json(200, {
+                    'sample_rate': tracer.sample_rate,
+                    'capacity': tracer.events.maxlen,
+                    'buffered_spans': len(tracer.events)
+                })
+            except (json.JSONDecodeError, ValueError, TypeError):
+                self.send_error(400, "Invalid trace settings")
         else:
             self.send_error(404, "Endpoint not found")
     
@@ -204,7 +360,7 @@ class RobotHTTPHandler(BaseHTTPRequestHandler):
         """Handle CORS preflight requests"""
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
         self.send_header('Access-Control-Allow-Headers', 'Content-Type')
         self.end_headers()
     
@@ -212,20 +368,22 @@ class RobotHTTPHandler(BaseHTTPRequestHandler):
         """Custom logging to avoid cluttering output"""
         logger.debug(f"HTTP: {format % args}")
 
-def create_handler(robot_controller):
-    """Create HTTP handler with robot controller"""
+def create_handler(robot_controller, command_queue):
+    """Create HTTP handler with robot controller and command queue"""
     def handler(*args, **kwargs):
-        return RobotHTTPHandler(robot_controller, *args, **kwargs)
+        return RobotHTTPHandler(robot_controller, command_queue, *args, **kwargs)
     return handler
 
 def main():
     """Main function to start robot controller server"""
     robot_controller = RobotController()
+    command_queue = CommandQueue(robot_controller)
     
     try:
         # Start HTTP server for web interface communication
+        # (threaded, so status long-polls don't hold up commands)
         server_port = 8081
-        httpd = HTTPServer(('0.0.0.0', server_port), create_handler(robot_controller))
+        httpd = ThreadingHTTPServer(('0.0.0.0', server_port), create_handler(robot_controller, command_queue))
         
         logger.info(f"🌐 Robot controller server started on port {server_port}")
         logger.info("📡 Ready to receive commands from web interface")
@@ -246,9 +404,13 @@ def main():
         logger.error(f"❌ Server error: {e}")
     
     finally:
-        robot_controller.shutdown()
+        # Stop taking requests, let the command in flight finish, then stop the robot
+        # so nothing can drive the wheels after the final stop
         if 'httpd' in locals():
             httpd.shutdown()
+            httpd.server_close()
+        command_queue.close()
+        robot_controller.shutdown()
         logger.info("👋 Controller stopped")
 
 if __name__ == "__main__":
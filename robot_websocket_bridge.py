@@ -13,6 +13,11 @@ import time
 from threading import Thread
 import signal
 import sys
+import resource
+
+import binary_protocol
+from circuit_breaker import CircuitBreaker
+from tracing import tracer
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -25,9 +30,23 @@ class RobotWebSocketBridge:
         self.power = 2000
         self.turn_power = 1500
         self.connected_clients = set()
+        self.status_seq = 0  # sequence number for binary status broadcasts
         self.last_command = None
         self.command_cooldown = 0.2
         self.last_command_time = 0
+        self.torque_state = {}  # motor -> 'on'/'off', resent after a reconnect
+        
+        # One actuator call at a time, run off the event loop. Streamed setpoints are
+        # coalesced: only the latest waiting one is sent, older ones are acked as superseded.
+        self.actuator_lock = asyncio.Lock()
+        self.pending_setpoint = None  # (websocket, frame) waiting for the actuator
+        self.setpoint_ready = asyncio.Event()
+        self.setpoint_task = None
+        self.last_setpoint = None  # (left, right) last sent by a setpoint, to skip repeats
+        
+        # Fail fast while the robot is unreachable, reconnect in the background
+        self.breaker = CircuitBreaker(reconnect=self.reconnect, probe=self.probe,
+                                      on_recovery=self.restore_safe_state)
         
         # Initialize robot
         self.initialize_robot()
@@ -43,42 +62,98 @@ class RobotWebSocketBridge:
         except Exception as e:
             logger.error(f"❌ Robot initialization failed: {e}")
     
+    def reconnect(self):
+        """Re-establish the ADB connection to the robot"""
+        subprocess.run(['adb', 'connect', f'{self.robot_ip}:5555'], capture_output=True, text=True, timeout=5)
+    
+    def probe(self):
+        """Check that the robot answers over ADB"""
+        result = subprocess.run(['adb', 'shell', 'echo', 'ok'], capture_output=True, text=True, timeout=3)
+        return result.returncode == 0 and 'ok' in result.stdout
+    
+    def restore_safe_state(self):
+        """After a reconnect, stop the wheels and resend the last torque settings"""
+        logger.info("🛡️ Restoring safe state after reconnect...")
+        for motor, state in sorted(self.torque_state.items()):
+            if not self.send_robot_command(f"torque {motor} {state}"):
+                return False
+        if not self.send_dual_wheel(0, 0):
+            return False
+        self.last_command = 'stop'
+        self.last_setpoint = None
+        return True
+    
+    def transport_available(self):
+        """Fail fast instead of waiting for a timeout while the robot is unreachable"""
+        if self.breaker.allow():
+            return True
+        tracer.annotate(result='circuit_open')
+        logger.debug("⚡ Robot unreachable, command dropped")
+        return False
+    
+    @tracer.traced('send_robot_command')
     def send_robot_command(self, cmd):
         """Send command directly to robot"""
+        parts = cmd.split()
+        if len(parts) == 3 and parts[0] == 'torque':
+            self.torque_state[parts[1]] = parts[2]
+        
+        if not self.transport_available():
+            return False
+        
         try:
             full_cmd = f"adb shell \"su -c 'cd {self.node_path} && echo \\\"{cmd}\\\" | ./node bot_shell_client.js'\""
-            result = subprocess.run(full_cmd, shell=True, capture_output=True, text=True, timeout=3)
+            with tracer.span('adb_subprocess', cmd=cmd):
+                result = subprocess.run(full_cmd, shell=True, capture_output=True, text=True, timeout=3)
             
             if result.returncode == 0:
                 logger.debug(f"✅ Robot command: {cmd}")
+                self.breaker.record_success()
                 return True
             else:
                 logger.error(f"❌ Robot command failed: {cmd}")
+                self.breaker.record_failure()
                 return False
         except Exception as e:
             logger.error(f"❌ Robot command error: {cmd} - {e}")
+            self.breaker.record_failure()
             return False
     
+    @tracer.traced('send_dual_wheel')
     def send_dual_wheel(self, left_speed, right_speed):
         """Send synchronized wheel commands"""
+        if not self.transport_available():
+            return False
+        
         try:
             cmd = f"adb shell \"su -c 'cd {self.node_path} && (echo \\\"rot 0 {left_speed}\\\"; echo \\\"rot 1 {right_speed}\\\") | ./node bot_shell_client.js'\""
-            result = subprocess.run(cmd, shell=True, capture_output=True, text=True, timeout=3)
-            return result.returncode == 0
+            with tracer.span('adb_subprocess', left_speed=left_speed, right_speed=right_speed):
+                result = subprocess.run(cmd, shell=True, capture_output=True, text=True, timeout=3)
+            
+            if result.returncode == 0:
+                self.breaker.record_success()
+                return True
+            self.breaker.record_failure()
+            return False
         except Exception as e:
             logger.error(f"❌ Dual wheel error: {e}")
+            self.breaker.record_failure()
             return False
     
+    @tracer.traced('execute_movement')
     def execute_movement(self, command):
         """Execute movement command with rate limiting"""
         current_time = time.time()
+        tracer.annotate(command=command)
         
         # Rate limiting
         if current_time - self.last_command_time < self.command_cooldown:
+            tracer.annotate(result='rate_limited')
             return True
         
         # Don't repeat the same command
         if command == self.last_command:
+            tracer.annotate(result='repeat')
             return True
         
         success = False
@@ -109,44 +184,180 @@ class RobotWebSocketBridge:
         
         return success
     
-    async def handle_client(self, websocket, path):
+    async def handle_client(self, websocket, path=None):
         """Handle WebSocket client connections"""
         self.connected_clients.add(websocket)
         client_ip = websocket.remote_address[0]
-        logger.info(f"🔗 Client connected: {client_ip}")
+        binary = websocket.subprotocol == binary_protocol.SUBPROTOCOL
+        logger.info(f"🔗 Client connected: {client_ip}{' (binary protocol)' if binary else ''}")
         
         try:
             async for message in websocket:
-                try:
-                    data = json.loads(message)
-                    command = data.get('command')
-                    
-                    if command:
-                        logger.info(f"📨 Received command: {command} from {client_ip}")
-                        success = self.execute_movement(command)
-                        
-                        # Send response back to client
-                        response = {
-                            'success': success,
-                            'command': command,
-                            'timestamp': time.time()
-                        }
-                        await websocket.send(json.dumps(response))
-                        
-                        # Broadcast to all clients
-                        await self.broadcast_status(command, success)
-                        
-                except json.JSONDecodeError:
-                    logger.error("❌ Invalid JSON received")
-                except Exception as e:
-                    logger.error(f"❌ Message handling error: {e}")
+                with tracer.span('handle_client', client=client_ip):
+                    if binary:
+                        await self.handle_binary_message(websocket, message, client_ip)
+                    else:
+                        await self.handle_message(websocket, message, client_ip)
                     
         except websockets.exceptions.ConnectionClosed:
             logger.info(f"🔌 Client disconnected: {client_ip}")
         finally:
-            self.connected_clients.remove(websocket)
+            self.connected_clients.discard(websocket)
+    
+    async def handle_message(self, websocket, message, client_ip):
+        """Handle one message from a client"""
+        try:
+            with tracer.span('json_parse'):
+                data = json.loads(message)
+            command = data.get('command')
+            
+            if command:
+                logger.info(f"📨 Received command: {command} from {client_ip}")
+                success = await self.run_movement(command)
+                
+                # Send response back to client
+                response = {
+                    'success': success,
+                    'command': command,
+                    'timestamp': time.time()
+                }
+                with tracer.span('ack_send'):
+                    await websocket.send(json.dumps(response))
+                
+                # Broadcast to all clients
+                with tracer.span('broadcast_status', clients=len(self.connected_clients)):
+                    await self.broadcast_status(command, success)
+            
+            elif data.get('admin') == 'trace':
+                # Admin request: {"admin": "trace"} returns the buffered spans as a Chrome trace,
+                # optionally reconfiguring with "sample_rate" and "clear"
+                tracer.configure(sample_rate=data.get('sample_rate'))
+                trace = tracer.export_chrome_trace()
+                if data.get('clear'):
+                    tracer.clear()
+                await websocket.send(json.dumps({'type': 'trace', 'trace': trace}))
+            
+            elif data.get('admin') == 'stats':
+                # Admin request used by websocket_load_test.py to watch for leaks
+                await websocket.send(json.dumps(self.server_stats()))
+                
+        except json.JSONDecodeError:
+            logger.error("❌ Invalid JSON received")
+        except Exception as e:
+            logger.error(f"❌ Message handling error: {e}")
     
-    async def broadcast_status(self, command, success):
+    async def handle_binary_message(self, websocket, message, client_ip):
+        """Handle one binary protocol frame from a client"""
+        try:
+            with tracer.span('binary_decode'):
+                frame = binary_protocol.decode(message)
+            
+            if frame['type'] == binary_protocol.MSG_SETPOINT:
+                logger.debug(f"📨 Setpoint L:{frame['left_speed']}, R:{frame['right_speed']} from {client_ip}")
+                await self.queue_setpoint(websocket, frame)
+                return  # acked by run_setpoints once sent, or as superseded
+            elif frame['type'] == binary_protocol.MSG_COMMAND and frame['command']:
+                command = frame['command']
+                logger.info(f"📨 Received command: {command} from {client_ip}")
+                success = await self.run_movement(command)
+            else:
+                logger.error(f"❌ Unexpected binary frame type {frame['type']} from {client_ip}")
+                return
+            
+            await self.send_ack(websocket, frame, success)
+            
+            with tracer.span('broadcast_status', clients=len(self.connected_clients)):
+                await self.broadcast_status(command, success, 0, 0)
+                
+        except ValueError as e:
+            logger.error(f"❌ Invalid binary frame: {e}")
+        except Exception as e:
+            logger.error(f"❌ Message handling error: {e}")
+    
+    async def send_ack(self, websocket, frame, success, superseded=False):
+        """Ack a binary frame, echoing its seq"""
+        ack = binary_protocol.encode(binary_protocol.MSG_ACK, seq=frame['seq'], command=frame['command'],
+                                     left_speed=frame['left_speed'], right_speed=frame['right_speed'],
+                                     success=success, superseded=superseded)
+        try:
+            with tracer.span('ack_send'):
+                await websocket.send(ack)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+    
+    async def queue_setpoint(self, websocket, frame):
+        """Make this the next setpoint to send, superseding any that hasn't been sent yet"""
+        superseded = self.pending_setpoint
+        self.pending_setpoint = (websocket, frame)
+        self.setpoint_ready.set()
+        
+        if self.setpoint_task is None:
+            self.setpoint_task = asyncio.create_task(self.run_setpoints())
+        if superseded is not None:
+            await self.send_ack(*superseded, success=False, superseded=True)
+    
+    async def supersede_pending_setpoint(self):
+        """Drop the waiting setpoint so it can't follow a named command onto the wheels"""
+        superseded = self.pending_setpoint
+        self.pending_setpoint = None
+        if superseded is not None:
+            await self.send_ack(*superseded, success=False, superseded=True)
+    
+    async def run_setpoints(self):
+        """Send the latest setpoint whenever the actuator is free"""
+        while True:
+            await self.setpoint_ready.wait()
+            self.setpoint_ready.clear()
+            if self.pending_setpoint is None:
+                continue
+            websocket, frame = self.pending_setpoint
+            self.pending_setpoint = None
+            speeds = (frame['left_speed'], frame['right_speed'])
+            
+            try:
+                async with self.actuator_lock:
+                    if speeds == self.last_setpoint:
+                        success = True  # Already driving at these speeds
+                    else:
+                        success = await asyncio.to_thread(self.send_dual_wheel, *speeds)
+                        if success:
+                            self.last_setpoint = speeds
+                            # The wheels no longer match the last named command, so it mustn't count as a repeat
+                            self.last_command = 'stop' if speeds == (0, 0) else None
+                
+                await self.send_ack(websocket, frame, success)
+                with tracer.span('broadcast_status', clients=len(self.connected_clients)):
+                    await self.broadcast_status('dual_wheel', success, *speeds)
+            except Exception as e:
+                logger.error(f"❌ Setpoint error: {e}")
+    
+    async def run_movement(self, command):
+        """Run a named command off the event loop, after any setpoint already on its way"""
+        await self.supersede_pending_setpoint()
+        async with self.actuator_lock:
+            success = await asyncio.to_thread(self.execute_movement, command)
+            if success:
+                self.last_setpoint = None
+        return success
+    
+    def server_stats(self):
+        """Client count and memory use of the bridge process"""
+        try:
+            with open('/proc/self/statm') as f:
+                rss_kb = int(f.read().split()[1]) * resource.getpagesize() // 1024
+        except OSError:
+            # No /proc (macOS): fall back to peak RSS, reported in bytes there
+            rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024
+        
+        return {
+            'type': 'stats',
+            'connected_clients': len(self.connected_clients),
+            'rss_kb': rss_kb,
+            'breaker': self.breaker.status(),
+            'timestamp': time.time()
+        }
+    
+    async def broadcast_status(self, command, success, left_speed=None, right_speed=None):
         """Broadcast status to all connected clients"""
         if self.connected_clients:
             status_message = {
@@ -155,12 +366,26 @@ class RobotWebSocketBridge:
                 'success': success,
                 'timestamp': time.time()
             }
+            if left_speed is not None:
+                status_message['left_speed'] = left_speed
+                status_message['right_speed'] = right_speed
+            
+            # Serialize once per protocol, not once per client
+            self.status_seq += 1
+            json_frame = json.dumps(status_message)
+            binary_frame = binary_protocol.encode(binary_protocol.MSG_STATUS, seq=self.status_seq, command=command,
+                                                  left_speed=left_speed or 0, right_speed=right_speed or 0,
+                                                  success=success,
+                                                  timestamp_us=int(status_message['timestamp'] * 1_000_000))
             
             # Send to all clients
             disconnected = set()
-            for client in self.connected_clients:
+            for client in list(self.connected_clients):  # clients may join or leave while we await
                 try:
-                    await client.send(json.dumps(status_message))
+                    if client.subprotocol == binary_protocol.SUBPROTOCOL:
+                        await client.send(binary_frame)
+                    else:
+                        await client.send(json_frame)
                 except websockets.exceptions.ConnectionClosed:
                     disconnected.add(client)
             
@@ -176,6 +401,17 @@ class RobotWebSocketBridge:
         self.send_robot_command("torque 3 off")
         logger.info("👋 Robot shutdown complete")
 
+def select_subprotocol(first, second):
+    """Pick the binary protocol if the client offers it, otherwise continue with JSON
+
+    websockets calls this as (client_subprotocols, server_subprotocols) in its
+    legacy server and as (connection, client_subprotocols) in the new one.
+    """
+    offered = first if isinstance(first, (list, tuple)) else second
+    if binary_protocol.SUBPROTOCOL in offered:
+        return binary_protocol.SUBPROTOCOL
+    return None
+
 async def main():
     """Main function to start WebSocket server"""
     bridge = RobotWebSocketBridge()
@@ -193,7 +429,10 @@ async def main():
         server_port = 8082
         logger.info(f"🌐 Starting WebSocket robot bridge on port {server_port}")
         
-        async with websockets.serve(bridge.handle_client, "0.0.0.0", server_port):
+        # Clients may negotiate the binary protocol; everyone else gets JSON text frames
+        async with websockets.serve(bridge.handle_client, "0.0.0.0", server_port,
+                                    subprotocols=[binary_protocol.SUBPROTOCOL],
+                                    select_subprotocol=select_subprotocol):
             logger.info("📡 WebSocket server ready for robot commands")
             logger.info("🛑 Press Ctrl+C to stop")
             
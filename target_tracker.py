@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Target Tracker
+Constant-velocity Kalman filter tracks for detected objects, with IoU/centroid
+association across frames and prediction through short occlusions
+"""
+
+import itertools
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class KalmanTrack:
+    """One tracked object: state is [cx, cy, w, h, vx, vy, vw, vh]"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, obj, timestamp, process_noise=50.0, measurement_noise=10.0):
+        self.id = next(self._ids)
+        self.state = np.zeros(8)
+        self.state[:4] = self.measurement(obj)
+        self.covariance = np.diag([measurement_noise] * 4 + [1000.0] * 4)
+        self.process_noise = process_noise
+        self.measurement_noise = np.eye(4) * measurement_noise
+
+        self.timestamp = timestamp  # time the state refers to
+        self.last_update = timestamp
+        self.hits = 1
+        self.area = obj['area']
+
+    @staticmethod
+    def measurement(obj):
+        return np.array([obj['center_x'], obj['center_y'], obj['width'], obj['height']], dtype=float)
+
+    @staticmethod
+    def transition(dt):
+        F = np.eye(8)
+        F[:4, 4:] = np.eye(4) * dt
+        return F
+
+    def predict(self, timestamp):
+        """Advance the filter to timestamp"""
+        dt = timestamp - self.timestamp
+        if dt <= 0:
+            return
+
+        F = self.transition(dt)
+        Q = np.diag([dt ** 3 / 3] * 4 + [dt] * 4) * self.process_noise
+        self.state = F @ self.state
+        self.covariance = F @ self.covariance @ F.T + Q
+        self.timestamp = timestamp
+
+    def update(self, obj, timestamp):
+        """Correct the filter with a matched detection"""
+        self.predict(timestamp)
+
+        H = np.eye(4, 8)
+        innovation = self.measurement(obj) - H @ self.state
+        S = H @ self.covariance @ H.T + self.measurement_noise
+        K = self.covariance @ H.T @ np.linalg.inv(S)
+        self.state = self.state + K @ innovation
+        self.covariance = (np.eye(8) - K @ H) @ self.covariance
+
+        self.last_update = timestamp
+        self.hits += 1
+        self.area = obj['area']
+
+    def state_at(self, timestamp):
+        """Extrapolate the state to timestamp without changing the filter"""
+        return self.transition(max(0.0, timestamp - self.timestamp)) @ self.state
+
+    def box(self, timestamp=None):
+        """Return the (predicted) object in detector format"""
+        state = self.state if timestamp is None else self.state_at(timestamp)
+        cx, cy = float(state[0]), float(state[1])
+        width, height = max(float(state[2]), 0.0), max(float(state[3]), 0.0)
+        return {
+            'x': cx - width / 2,
+            'y': cy - height / 2,
+            'width': width,
+            'height': height,
+            'center_x': cx,
+            'center_y': cy,
+            'area': self.area,
+            'track_id': self.id
+        }
+
+def iou(a, b):
+    """Intersection over union of two detector-format boxes"""
+    left = max(a['x'], b['x'])
+    top = max(a['y'], b['y'])
+    right = min(a['x'] + a['width'], b['x'] + b['width'])
+    bottom = min(a['y'] + a['height'], b['y'] + b['height'])
+
+    intersection = max(0.0, right - left) * max(0.0, bottom - top)
+    union = a['width'] * a['height'] + b['width'] * b['height'] - intersection
+    return intersection / union if union > 0 else 0.0
+
+class TargetTracker:
+    def __init__(self, max_age=0.5, min_hits=3, min_iou=0.1, max_centroid_distance=0.5):
+        self.max_age = max_age  # seconds a track survives without detections
+        self.min_hits = min_hits  # detections before a track can become the target
+        self.min_iou = min_iou
+        self.max_centroid_distance = max_centroid_distance  # fraction of the track's box size
+        self.tracks = []
+        self.target_id = None
+
+    def update(self, objects, timestamp):
+        """Fold one frame of detections into the tracks"""
+        for track in self.tracks:
+            track.predict(timestamp)
+
+        unmatched_tracks = list(self.tracks)
+        unmatched_objects = list(objects)
+
+        # Greedy association, best IoU first, then nearest centroid for what's left
+        for score, track, obj in self._candidates(unmatched_tracks, unmatched_objects):
+            if track in unmatched_tracks and obj in unmatched_objects:
+                track.update(obj, timestamp)
+                unmatched_tracks.remove(track)
+                unmatched_objects.remove(obj)
+
+        for obj in unmatched_objects:
+            self.tracks.append(KalmanTrack(obj, timestamp))
+
+        expired = [track for track in self.tracks if timestamp - track.last_update > self.max_age]
+        for track in expired:
+            logger.debug(f"Track {track.id} lost")
+            self.tracks.remove(track)
+
+    def _candidates(self, tracks, objects):
+        by_iou = []
+        by_distance = []
+        for track in tracks:
+            box = track.box()
+            gate = self.max_centroid_distance * max(box['width'], box['height'], 1.0)
+            for obj in objects:
+                overlap = iou(box, obj)
+                if overlap >= self.min_iou:
+                    by_iou.append((overlap, track, obj))
+                    continue
+
+                distance = np.hypot(box['center_x'] - obj['center_x'], box['center_y'] - obj['center_y'])
+                if distance <= gate:
+                    by_distance.append((distance, track, obj))
+
+        by_iou.sort(key=lambda item: item[0], reverse=True)
+        by_distance.sort(key=lambda item: item[0])
+        return by_iou + by_distance
+
+    def confirmed_tracks(self):
+        return [track for track in self.tracks if track.hits >= self.min_hits]
+
+    def target(self, timestamp):
+        """Predicted position of the followed object at timestamp, or None
+
+        Stays locked on the same track while it is alive, so a larger object
+        appearing in the background doesn't steal the target.
+        """
+        confirmed = [track for track in self.confirmed_tracks() if timestamp - track.last_update <= self.max_age]
+        if not confirmed:
+            self.target_id = None
+            return None
+
+        current = next((track for track in confirmed if track.id == self.target_id), None)
+        if current is None:
+            current = max(confirmed, key=lambda track: track.area)
+            self.target_id = current.id
+            logger.info(f"🎯 Locked on track {current.id}")
+
+        return current.box(timestamp)
+
+    def reset(self):
+        self.tracks = []
+        self.target_id = None
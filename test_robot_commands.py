@@ -6,7 +6,6 @@ Simple test script to verify robot commands work
 import asyncio
 import websockets
 import json
-import time
 
 async def test_robot_commands():
     """Test robot commands via WebSocket"""
@@ -37,8 +36,8 @@ async def test_robot_commands():
                 except asyncio.TimeoutError:
                     print("⏱️ No response received")
                 
-                # Wait between commands
-                time.sleep(1)
+                # Wait between commands (without blocking the event loop)
+                await asyncio.sleep(1)
             
             print("✅ Robot command test completed!")
             
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Hot Path Tracing
+Sampled span tracing kept in a ring buffer, exportable as Chrome trace-event JSON
+(open in chrome://tracing or https://ui.perfetto.dev)
+"""
+
+import contextvars
+import functools
+import os
+import random
+import threading
+import time
+from collections import deque
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+class _NoopSpan:
+    """Returned when tracing is off or the trace isn't sampled"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **args):
+        pass
+
+_NOOP_SPAN = _NoopSpan()
+
+class _UnsampledSpan(_NoopSpan):
+    """Root of a trace that lost the sampling draw, so its children are skipped too"""
+
+    def __enter__(self):
+        self.token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_span.reset(self.token)
+        return False
+
+class _Span:
+    __slots__ = ('tracer', 'name', 'args', 'start', 'token')
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.token = _current_span.set(self)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        _current_span.reset(self.token)
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        self.tracer._record(self.name, self.start, end, self.args)
+        return False
+
+    def set(self, **args):
+        """Attach extra arguments to the span (shown in the trace viewer)"""
+        self.args.update(args)
+
+class Tracer:
+    def __init__(self, sample_rate=0.0, capacity=10000):
+        self.sample_rate = sample_rate  # fraction of root spans to record, 0 turns tracing off
+        self.events = deque(maxlen=capacity)  # ring buffer, oldest events are dropped
+        self.epoch = time.perf_counter_ns()
+        self.pid = os.getpid()
+
+    @property
+    def enabled(self):
+        return self.sample_rate > 0
+
+    def configure(self, sample_rate=None, capacity=None):
+        if sample_rate is not None:
+            self.sample_rate = max(0.0, min(1.0, float(sample_rate)))
+        if capacity is not None and capacity != self.events.maxlen:
+            self.events = deque(self.events, maxlen=int(capacity))
+
+    def span(self, name, **args):
+        """Context manager timing a block; nested spans share their root's sampling decision"""
+        if not self.sample_rate:
+            return _NOOP_SPAN
+
+        parent = _current_span.get()
+        if parent is None:
+            if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+                return _UnsampledSpan()
+        elif isinstance(parent, _NoopSpan):
+            return _NOOP_SPAN
+
+        return _Span(self, name, args)
+
+    def annotate(self, **args):
+        """Attach arguments to the innermost recording span, if any"""
+        span = _current_span.get()
+        if span is not None:
+            span.set(**args)
+
+    def traced(self, name=None):
+        """Decorator wrapping a function in a span"""
+        def decorator(func):
+            span_name = name or func.__qualname__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.sample_rate:
+                    return func(*args, **kwargs)
+                with self.span(span_name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _record(self, name, start, end, args):
+        self.events.append((name, start, end, threading.get_ident(), args))
+
+    def clear(self):
+        self.events.clear()
+
+    def export_chrome_trace(self):
+        """Return the buffered spans as a Chrome trace-event JSON object"""
+        events = []
+        for name, start, end, tid, args in list(self.events):
+            events.append({
+                'name': name,
+                'cat': 'robot',
+                'ph': 'X',
+                'ts': (start - self.epoch) / 1000,
+                'dur': (end - start) / 1000,
+                'pid': self.pid,
+                'tid': tid,
+                'args': args
+            })
+
+        return {
+            'traceEvents': events,
+            'displayTimeUnit': 'ms',
+            'otherData': {
+                'sample_rate': self.sample_rate,
+                'capacity': self.events.maxlen
+            }
+        }
+
+# Process-wide tracer, off unless ROBOT_TRACE_SAMPLE_RATE is set (e.g. 1.0 or 0.1)
+tracer = Tracer(sample_rate=float(os.environ.get('ROBOT_TRACE_SAMPLE_RATE', '0') or 0))
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+WebSocket Load Generator and Soak Test
+Opens many concurrent clients against robot_websocket_bridge.py and reports
+ack latency, broadcast lag, bridge memory and error counts
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import websockets
+
+import binary_protocol
+
+FAKE_ADB = """#!/bin/sh
+# Fake adb for load tests: pretend every command succeeds after a short delay
+sleep {delay}
+case "$*" in *"echo ok"*) echo ok;; esac
+exit 0
+"""
+
+class LatencyStats:
+    """Count, max and a bounded random sample for percentiles"""
+
+    def __init__(self, reservoir_size=100000):
+        self.reservoir_size = reservoir_size
+        self.samples = []
+        self.count = 0
+        self.max = 0.0
+
+    def add(self, value):
+        self.count += 1
+        self.max = max(self.max, value)
+        if len(self.samples) < self.reservoir_size:
+            self.samples.append(value)
+        else:
+            index = random.randrange(self.count)
+            if index < self.reservoir_size:
+                self.samples[index] = value
+
+    def percentile(self, p):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'p50_ms': 1000 * self.percentile(50),
+            'p90_ms': 1000 * self.percentile(90),
+            'p99_ms': 1000 * self.percentile(99),
+            'max_ms': 1000 * self.max
+        }
+
+class LoadTestStats:
+    def __init__(self):
+        self.ack_latency = LatencyStats()
+        self.broadcast_lag = LatencyStats()
+        self.sent = 0
+        self.acked = 0
+        self.failed_acks = 0  # acks with success: false
+        self.superseded = 0  # setpoint acks for frames replaced by a newer setpoint
+        self.connect_errors = 0
+        self.disconnects = 0
+        self.send_errors = 0
+        self.active_clients = 0
+        self.server_stats = []  # (elapsed, stats message) samples
+
+    def errors(self):
+        return {
+            'connect_errors': self.connect_errors,
+            'disconnects': self.disconnects,
+            'send_errors': self.send_errors,
+            'failed_acks': self.failed_acks
+        }
+
+def parse_mix(mix):
+    """Parse 'forward=1,stop=2' into (commands, weights)"""
+    commands, weights = [], []
+    for item in mix.split(','):
+        name, _, weight = item.partition('=')
+        commands.append(name.strip())
+        weights.append(float(weight or 1))
+    return commands, weights
+
+async def run_client(index, args, stats, commands, weights, deadline):
+    """One simulated browser: send commands at a fixed rate and time the acks"""
+    # Stagger connects over the ramp-up period
+    await asyncio.sleep(args.ramp_up * index / max(args.clients, 1))
+
+    subprotocols = [binary_protocol.SUBPROTOCOL] if args.binary else None
+    try:
+        websocket = await websockets.connect(args.uri, open_timeout=args.timeout, subprotocols=subprotocols)
+    except Exception:
+        stats.connect_errors += 1
+        return
+
+    stats.active_clients += 1
+    pending = []  # JSON send times, the bridge answers each connection in order
+    pending_seq = {}  # binary seq -> send time, setpoint acks can overtake command acks
+
+    async def reader():
+        async for message in websocket:
+            received = time.time()
+            if isinstance(message, bytes):
+                frame = binary_protocol.decode(message)
+                if frame['type'] == binary_protocol.MSG_STATUS:
+                    stats.broadcast_lag.add(max(0.0, received - frame['timestamp_us'] / 1_000_000))
+                    continue
+                sent_at = pending_seq.pop(frame['seq'], None)
+                if sent_at is None:
+                    continue
+                stats.ack_latency.add(time.perf_counter() - sent_at)
+                stats.acked += 1
+                if frame['superseded']:
+                    stats.superseded += 1
+                elif not frame['success']:
+                    stats.failed_acks += 1
+                continue
+
+            data = json.loads(message)
+            if data.get('type') == 'status':
+                stats.broadcast_lag.add(max(0.0, received - data['timestamp']))
+                continue
+            if 'command' in data and pending:
+                stats.ack_latency.add(time.perf_counter() - pending.pop(0))
+                stats.acked += 1
+                if not data.get('success'):
+                    stats.failed_acks += 1
+
+    reader_task = asyncio.create_task(reader())
+    interval = 1.0 / args.rate if args.rate > 0 else 0
+
+    try:
+        while time.monotonic() < deadline and not reader_task.done():
+            command = random.choices(commands, weights)[0]
+            if args.binary:
+                seq = stats.sent
+                pending_seq[seq] = time.perf_counter()
+                if command == 'setpoint':
+                    speed = random.randint(-2000, 2000)
+                    frame = binary_protocol.encode(binary_protocol.MSG_SETPOINT, seq=seq,
+                                                   left_speed=-speed, right_speed=speed)
+                else:
+                    frame = binary_protocol.encode(binary_protocol.MSG_COMMAND, seq=seq, command=command)
+                await websocket.send(frame)
+            else:
+                pending.append(time.perf_counter())
+                await websocket.send(json.dumps({'command': command}))
+            stats.sent += 1
+
+            # Jitter the interval so clients don't fire in lockstep
+            await asyncio.sleep(interval * random.uniform(0.5, 1.5))
+
+        # Give outstanding acks a moment to arrive
+        wait_until = time.monotonic() + args.timeout
+        while (pending or pending_seq) and not reader_task.done() and time.monotonic() < wait_until:
+            await asyncio.sleep(0.05)
+
+    except websockets.exceptions.ConnectionClosed:
+        stats.disconnects += 1
+    except Exception:
+        stats.send_errors += 1
+    finally:
+        if reader_task.done() and not reader_task.cancelled() and reader_task.exception() is not None:
+            stats.disconnects += 1
+        reader_task.cancel()
+        await websocket.close()
+        stats.active_clients -= 1
+
+async def poll_server_stats(args, stats, start, deadline):
+    """Ask the bridge for its client count and memory use at every report interval"""
+    try:
+        async with websockets.connect(args.uri, open_timeout=args.timeout) as websocket:
+            while True:
+                await websocket.send(json.dumps({'admin': 'stats'}))
+                # Skip broadcasts until the stats reply arrives
+                while True:
+                    data = json.loads(await asyncio.wait_for(websocket.recv(), timeout=args.timeout))
+                    if data.get('type') == 'stats':
+                        break
+                stats.server_stats.append((time.monotonic() - start, data))
+                report(stats, time.monotonic() - start)
+
+                if time.monotonic() >= deadline:
+                    return
+                await asyncio.sleep(min(args.report_interval, max(0.0, deadline - time.monotonic())))
+    except Exception as e:
+        print(f"⚠️ Server stats unavailable: {e}")
+
+def report(stats, elapsed):
+    ack = stats.ack_latency.summary()
+    lag = stats.broadcast_lag.summary()
+    line = (f"[{elapsed:6.0f}s] clients {stats.active_clients}, sent {stats.sent}, acked {stats.acked} | "
+            f"ack p50 {ack['p50_ms']:.1f}ms p99 {ack['p99_ms']:.1f}ms | "
+            f"broadcast lag p50 {lag['p50_ms']:.1f}ms p99 {lag['p99_ms']:.1f}ms | "
+            f"errors {sum(stats.errors().values())}")
+    if stats.server_stats:
+        server = stats.server_stats[-1][1]
+        line += f" | bridge {server['connected_clients']} clients, {server['rss_kb'] / 1024:.1f}MB"
+    print(line)
+
+def summarize(stats, elapsed):
+    summary = {
+        'elapsed': elapsed,
+        'sent': stats.sent,
+        'acked': stats.acked,
+        'superseded': stats.superseded,
+        'commands_per_second': stats.sent / elapsed if elapsed > 0 else 0.0,
+        'ack_latency': stats.ack_latency.summary(),
+        'broadcast_lag': stats.broadcast_lag.summary(),
+        'errors': stats.errors()
+    }
+
+    if stats.server_stats:
+        first, last = stats.server_stats[0][1], stats.server_stats[-1][1]
+        summary['bridge'] = {
+            'rss_start_kb': first['rss_kb'],
+            'rss_end_kb': last['rss_kb'],
+            'rss_growth_kb': last['rss_kb'] - first['rss_kb'],
+            'max_connected_clients': max(s['connected_clients'] for _, s in stats.server_stats),
+            'connected_clients_at_end': last['connected_clients']
+        }
+
+    return summary
+
+def start_fake_bridge(args):
+    """Run robot_websocket_bridge.py with a fake adb on PATH"""
+    fake_dir = tempfile.mkdtemp(prefix='fake_adb_')
+    fake_adb = os.path.join(fake_dir, 'adb')
+    with open(fake_adb, 'w') as f:
+        f.write(FAKE_ADB.format(delay=args.fake_adb_delay))
+    os.chmod(fake_adb, 0o755)
+
+    env = dict(os.environ, PATH=fake_dir + os.pathsep + os.environ.get('PATH', ''))
+    bridge = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'robot_websocket_bridge.py')
+    process = subprocess.Popen([sys.executable, bridge], env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    print(f"🧪 Started bridge with fake adb (PID: {process.pid})")
+    return process
+
+async def wait_for_bridge(uri, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with websockets.connect(uri):
+                return True
+        except OSError:
+            await asyncio.sleep(0.2)
+    return False
+
+async def run_load_test(args):
+    commands, weights = parse_mix(args.mix)
+    if 'setpoint' in commands and not args.binary:
+        print("❌ Setpoints are only part of the binary protocol, add --binary")
+        return None
+    stats = LoadTestStats()
+
+    if not await wait_for_bridge(args.uri):
+        print(f"❌ Cannot connect to {args.uri}. Make sure robot_websocket_bridge.py is running.")
+        return None
+
+    print(f"🚀 {args.clients} clients x {args.rate:g} cmd/s for {args.duration:g}s against {args.uri}")
+    print(f"   Protocol: {'binary (' + binary_protocol.SUBPROTOCOL + ')' if args.binary else 'JSON'}")
+    print(f"   Command mix: {', '.join(f'{c}={w:g}' for c, w in zip(commands, weights))}")
+
+    start = time.monotonic()
+    deadline = start + args.duration
+    clients = [run_client(i, args, stats, commands, weights, deadline) for i in range(args.clients)]
+    await asyncio.gather(poll_server_stats(args, stats, start, deadline), *clients)
+
+    return summarize(stats, time.monotonic() - start)
+
+def main():
+    """Main function with command line argument parsing"""
+    parser = argparse.ArgumentParser(description='WebSocket bridge load generator and soak test')
+    parser.add_argument('--uri', default='ws://localhost:8082', help='Bridge URI (default: ws://localhost:8082)')
+    parser.add_argument('--clients', type=int, default=100, help='Concurrent clients (default: 100)')
+    parser.add_argument('--rate', type=float, default=2, help='Commands per second per client (default: 2)')
+    parser.add_argument('--duration', type=float, default=60, help='Test duration in seconds (default: 60)')
+    parser.add_argument('--ramp-up', type=float, default=5, help='Seconds to spread client connects over (default: 5)')
+    parser.add_argument('--mix', default='forward=1,backward=1,left=1,right=1,stop=2',
+                        help='Weighted command mix, "setpoint" streams wheel speeds with --binary '
+                             '(default: forward=1,backward=1,left=1,right=1,stop=2)')
+    parser.add_argument('--binary', action='store_true', help='Use the binary subprotocol instead of JSON')
+    parser.add_argument('--timeout', type=float, default=5, help='Connect/ack timeout in seconds (default: 5)')
+    parser.add_argument('--report-interval', type=float, default=10, help='Seconds between progress reports (default: 10)')
+    parser.add_argument('--spawn-bridge', action='store_true', help='Start robot_websocket_bridge.py with a fake adb')
+    parser.add_argument('--fake-adb-delay', type=float, default=0.05, help='Seconds each fake adb call takes (default: 0.05)')
+    parser.add_argument('--output', help='Write the JSON summary to this file')
+
+    args = parser.parse_args()
+
+    bridge = start_fake_bridge(args) if args.spawn_bridge else None
+    try:
+        summary = asyncio.run(run_load_test(args))
+    except KeyboardInterrupt:
+        summary = None
+        print("\n🛑 Load test interrupted")
+    finally:
+        if bridge is not None:
+            bridge.terminate()
+            bridge.wait()
+
+    if summary is None:
+        sys.exit(1)
+
+    print("")
+    print("📊 Load test summary")
+    print(json.dumps(summary, indent=2))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2)
+        print(f"💾 Summary written to {args.output}")
+
+if __name__ == "__main__":
+    main()